@@ -96,4 +96,5 @@ def failed_targets(
                     fs=fs,
                     spec_hashes=spec_hashes,
                     backend=backend,
+                    graph=graph,
                 )
@@ -1,15 +1,13 @@
-import re
 from datetime import timedelta
 from gwf.core import CachedFilesystem, Graph, Target, FileSpecHashes, NoopSpecHashes
 from gwf.scheduling import submit_workflow
-from typing import Any
+from typing import Any, Callable
 
 from .utilities import FailureType
 
 
-MEMORY_REGEX = re.compile(r"(?P<size>\d+)(?P<unit>[a-zA-Z]+)")
-WALLTIME_REGEX = re.compile(
-    r"^((?P<days>\d+)-)?(?P<hours>\d+):(?P<minutes>\d+):(?P<seconds>\d+)$"
+RESTARTABLE = frozenset(
+    {FailureType.Timeout, FailureType.OutOfMemory, FailureType.FileSystem}
 )
 
 
@@ -26,18 +24,17 @@ def parse_walltime(walltime: str) -> timedelta:
     Raises:
         ValueError: If the walltime string is in an invalid format.
     """
-    parts = WALLTIME_REGEX.match(walltime)
+    days, separator, time = walltime.partition("-")
+    if not separator:
+        days, time = "0", days
+    parts = [days, *time.split(":")]
 
-    if not parts:
+    if len(parts) != 4 or not all(part.isdecimal() for part in parts):
         raise ValueError(f"Invalid walltime format: {walltime}")
 
-    parts = parts.groupdict()
-    time_params = {}
-    for name, param in parts.items():
-        if param:
-            time_params[name] = int(param)
+    days, hours, minutes, seconds = map(int, parts)
 
-    return timedelta(**time_params)
+    return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
 
 
 def format_walltime(walltime: timedelta) -> str:
@@ -96,17 +93,23 @@ def modify_memory(memory: str, multiplier: float) -> str:
     Raises:
         ValueError: If the memory string is in an invalid format.
     """
-    parts = MEMORY_REGEX.match(memory)
+    unit = memory.lstrip("0123456789")
+    size = memory[: len(memory) - len(unit)]
 
-    if not parts:
+    if not size or not (unit.isascii() and unit.isalpha()):
         raise ValueError(f"Invalid memory format: {memory}")
 
-    size, unit = parts.groups()
     size = int(size) * multiplier
 
     return f"{size:.0f}{unit}"
 
 
+RESOURCE_MODIFIERS: dict[FailureType, tuple[str, Callable[[str, float], str]]] = {
+    FailureType.OutOfMemory: ("memory", modify_memory),
+    FailureType.Timeout: ("walltime", modify_walltime),
+}
+
+
 def update_target_options(
     targets: dict[str, Target],
     failure_map: dict[Target, FailureType],
@@ -124,25 +127,32 @@ def update_target_options(
         dict[str, Target]: The updated dictionary of target names to Target objects with modified options.
     """
     for target, failure in failure_map.items():
-        match failure:
-            case FailureType.OutOfMemory:
-                target.options["memory"] = modify_memory(
-                    memory=target.options["memory"],
-                    multiplier=multiplier,
-                )
-            case FailureType.Timeout:
-                target.options["walltime"] = modify_walltime(
-                    walltime=target.options["walltime"],
-                    multiplier=multiplier,
-                )
-            case _:
-                continue
+        if (modifier := RESOURCE_MODIFIERS.get(failure)) is None:
+            continue
 
+        option, modify = modifier
+        target.options[option] = modify(target.options[option], multiplier)
         targets[target.name] = target
 
     return targets
 
 
+def _collect_dependents(
+    targets: list[Target],
+    dependents: dict[Target, set[Target]],
+) -> set[Target]:
+    """Collect the given targets and all of their transitive dependents."""
+    collected = set(targets)
+    stack = list(collected)
+    while stack:
+        for dependent in dependents.get(stack.pop(), ()):
+            if dependent not in collected:
+                collected.add(dependent)
+                stack.append(dependent)
+
+    return collected
+
+
 def get_restartable_targets(
     dependents: dict[Target, set[Target]],
     failure_map: dict[Target, FailureType],
@@ -162,28 +172,54 @@ def get_restartable_targets(
         set[Target]: A set of target objects that are restartable.
     """
 
-    def add_dependents(target: Target, target_set: set[str]) -> None:
-        target_dependents = dependents.get(target, set())
+    restartable = _collect_dependents(
+        targets=[
+            target for target, failure in failure_map.items() if failure in RESTARTABLE
+        ],
+        dependents=dependents,
+    )
+    not_restartable = _collect_dependents(
+        targets=[
+            target
+            for target, failure in failure_map.items()
+            if failure not in RESTARTABLE
+        ],
+        dependents=dependents,
+    )
 
-        for dependent in target_dependents:
-            target_set.add(dependent)
+    return restartable - not_restartable
 
-            add_dependents(dependent, target_set)
 
-    restartable, not_restartable = set(), set()
+def get_restart_subgraph_targets(
+    targets: dict[str, Target],
+    graph: Graph,
+    failure_map: dict[Target, FailureType],
+) -> dict[str, Target]:
+    """
+    Select the targets needed to restart the failed targets of a workflow.
 
-    for target, failure in failure_map.items():
-        match failure:
-            case FailureType.Timeout | FailureType.OutOfMemory | FailureType.FileSystem:
-                restartable.add(target)
-                add_dependents(target=target, target_set=restartable)
-            case _:
-                not_restartable.add(target)
-                add_dependents(target=target, target_set=not_restartable)
+    The selection contains the failed targets, their transitive dependents and all
+    transitive dependencies of those, so that scheduling sees the same dependency
+    edges as in the full workflow graph.
+
+    Args:
+        targets (dict[str, Target]): A dictionary mapping target names to Target objects.
+        graph (Graph): The graph of the full workflow.
+        failure_map (dict[Target, FailureType]): A dictionary mapping Target objects to their respective failure types.
 
-    restartable -= not_restartable
+    Returns:
+        dict[str, Target]: The subset of targets reachable from the failed targets.
+    """
+    affected = _collect_dependents(
+        targets=list(failure_map),
+        dependents=graph.dependents,
+    )
+    required = _collect_dependents(
+        targets=list(affected),
+        dependents=graph.dependencies,
+    )
 
-    return restartable
+    return {name: target for name, target in targets.items() if target in required}
 
 
 def restart_targets(
@@ -193,13 +229,15 @@ def restart_targets(
     fs: CachedFilesystem,
     spec_hashes: FileSpecHashes | NoopSpecHashes,
     backend: Any,
+    graph: Graph | None = None,
 ) -> None:
     """
     Restart failed targets and their dependents in a workflow.
 
     This function updates the options for the given targets based on the failure map and multiplier,
     constructs a graph from the updated targets, identifies the restartable targets, and submits
-    the workflow for execution.
+    the workflow for execution. If the graph of the full workflow is given, only the targets
+    reachable from the failed targets are included in the constructed graph.
 
     Args:
         targets (dict[str, Target]): A dictionary mapping target names to Target objects.
@@ -208,6 +246,7 @@ def restart_targets(
         fs (CachedFilesystem): A filesystem object used for caching.
         spec_hashes (FileSpecHashes | NoopSpecHashes): An object representing file specification hashes.
         backend (Any): The backend used for workflow execution.
+        graph (Graph | None): The graph of the full workflow. If None, the graph is built from all targets.
 
     Returns:
         None
@@ -217,6 +256,12 @@ def restart_targets(
         failure_map=failure_map,
         multiplier=multiplier,
     )
+    if graph is not None:
+        targets = get_restart_subgraph_targets(
+            targets=targets,
+            graph=graph,
+            failure_map=failure_map,
+        )
     graph = Graph.from_targets(targets=targets, fs=fs)
 
     endpoints = get_restartable_targets(
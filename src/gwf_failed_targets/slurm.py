@@ -1,28 +1,55 @@
+import csv
 import json
-import re
+import os
 import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, fields
 from datetime import datetime
+from functools import cached_property
 from gwf.core import Context, Target
 from gwf_utilization.accounting import _parse_memory_string
 from gwf_utilization.main import pretty_size
 from json import JSONDecodeError
 from pathlib import Path
 from texttable import Texttable
-from typing import Dict, Generator, List, Optional
+from typing import Dict, Generator, Iterable, List, Optional, Tuple
 
 from .utilities import FailureType, tail
 
 
-TIMEOUT_REGEX = r"error: \*\*\* JOB [0-9]+ ON [a-zA-Z0-9_-]+ CANCELLED AT [0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2} DUE TO TIME LIMIT \*\*\*"
-OOM_REGEX = r"error: Detected [0-9]+ oom_kill events? in StepId=[0-9]+.batch. Some of the step tasks have been OOM Killed."
+TIMEOUT_LIST = [
+    b"CANCELLED AT",
+    b"DUE TO TIME LIMIT",
+]
+OOM_LIST = [
+    b"oom_kill event",
+    b"OOM Killed",
+]
 FS_LIST = [
-    "Device or resource busy",
-    "sed: No such file or directory",
-    "python: No such file or directory",
+    b"Device or resource busy",
+    b"sed: No such file or directory",
+    b"python: No such file or directory",
 ]
 
 
+def _determine_cause_of_failure(
+    log: bytes,
+    state: Optional[str] = None,
+) -> FailureType:
+    """Determine the cause of failure of a slurm job from the tail of its log."""
+    if state == "TIMEOUT" or all(s in log for s in TIMEOUT_LIST):
+        return FailureType.Timeout
+    elif all(s in log for s in OOM_LIST):
+        return FailureType.OutOfMemory
+    elif b"error: Batch job submission failed" in log:
+        return FailureType.Submission
+    elif any(s in log for s in FS_LIST):
+        return FailureType.FileSystem
+    return FailureType.Unknown
+
+
 @dataclass
 class TargetRecord:
     time_of_failure: datetime
@@ -68,6 +95,8 @@ class SlurmAccounting:
         "State",
         "ExitCode",
     ]
+    LOG_WORKERS = 16
+    MAX_TABLE_ROWS = 200
 
     def __init__(
         self,
@@ -78,11 +107,12 @@ class SlurmAccounting:
         self.context = context
         self.targets = targets
         self.sacct_fields = sacct_fields
-        self.failure_map: dict[Target, FailureType] = {}
+        self._logs_dir = Path(self.context.logs_dir)
 
-    @property
+    @cached_property
     def tracked_jobs(self) -> Dict[str, str]:
-        """Load jobs tracked by the slurm backend."""
+        """Load jobs tracked by the slurm backend.
+        The jobs are loaded once per instance; create a new instance to reload them."""
         tracked_jobs_path = (
             Path(self.context.working_dir) / ".gwf" / "slurm-backend-tracked.json"
         )
@@ -91,115 +121,154 @@ class SlurmAccounting:
         except (FileNotFoundError, JSONDecodeError):
             return {}
 
-    def _get_log_modification_time(
+    def _inspect_log(
         self,
         target: Target,
-    ) -> datetime:
-        """Get the last modification time of a target's stderr log file."""
-        log_path = Path(self.context.logs_dir) / f"{target.name}.stderr"
-        stat = log_path.stat()
-        mod_time = datetime.fromtimestamp(stat.st_ctime)
-        return mod_time
-
-    def _determine_cause_of_failure(
+        state: Optional[str] = None,
+    ) -> Tuple[datetime, FailureType]:
+        """Get the last modification time of a target's stderr log file and
+        determine the cause of failure of the target's slurm job."""
+        log_path = self._logs_dir / f"{target.name}.stderr"
+        with log_path.open(mode="rb") as f:
+            mod_time = datetime.fromtimestamp(os.fstat(f.fileno()).st_ctime)
+            log = b"\n".join(tail(f, n=3))
+
+        return mod_time, _determine_cause_of_failure(log=log, state=state)
+
+    def _sacct(self, job_ids: Iterable[str]) -> Generator[Dict[str, str], None, None]:
+        """Stream accounting records of slurm jobs from sacct."""
+        args = [
+            "sacct",
+            "--jobs",
+            ",".join(job_ids),
+            "--format",
+            ",".join(self.sacct_fields),
+            "--parsable2",
+        ]
+        # Stderr goes to a temporary file, as reading it from a second pipe only
+        # after stdout is exhausted can deadlock on large error output.
+        with tempfile.TemporaryFile(mode="w+") as err:
+            with subprocess.Popen(
+                args=args,
+                stdout=subprocess.PIPE,
+                stderr=err,
+                text=True,
+            ) as p:
+                yield from csv.DictReader(
+                    p.stdout,
+                    delimiter="|",
+                    quoting=csv.QUOTE_NONE,
+                )
+            err.seek(0)
+            stderr = err.read()
+
+        if p.returncode != 0:
+            raise subprocess.CalledProcessError(
+                returncode=p.returncode,
+                cmd=args,
+                stderr=stderr,
+            )
+
+    def _build_record(
         self,
         target: Target,
-        state: Optional[str] = None,
-    ) -> FailureType:
-        """Determine the cause of failure of a target's slurm job."""
-        log_path = Path(self.context.logs_dir) / f"{target.name}.stderr"
-        with log_path.open() as f:
-            log = "\n".join(tail(f, n=3))
-
-        if state == "TIMEOUT" or re.search(pattern=TIMEOUT_REGEX, string=log):
-            return FailureType.Timeout
-        elif re.search(pattern=OOM_REGEX, string=log):
-            return FailureType.OutOfMemory
-        elif "error: Batch job submission failed" in log:
-            return FailureType.Submission
-        elif any(s in log for s in FS_LIST):
-            return FailureType.FileSystem
-        return FailureType.Unknown
+        accounting: Dict[str, str],
+    ) -> TargetRecord:
+        """Build the record of a failed target from its accounting and log."""
+        time_of_failure, failure_type = self._inspect_log(
+            target=target,
+            state=accounting["State"],
+        )
 
-    def fetch(self) -> Generator[TargetRecord, None, None]:
-        """Fetch records of failed targets present in tracked jobs."""
+        return TargetRecord(
+            time_of_failure=time_of_failure,
+            name=target.name,
+            # group=target.group,
+            node=accounting["NodeList"],
+            failure_type=failure_type,
+            exit_code=accounting["ExitCode"],
+            allocated_memory=_parse_memory_string(
+                memory_string=accounting["ReqMem"],
+                cores=accounting["NCPUS"],
+                nodes=accounting["NNodes"],
+            ),
+            used_memory=_parse_memory_string(
+                memory_string=accounting["MaxRSS"],
+                cores=accounting["NCPUS"],
+                nodes=accounting["NNodes"],
+            ),
+            allocated_walltime=accounting["Timelimit"],
+            used_walltime=accounting["Elapsed"],
+        )
+
+    def _fetch(self) -> Generator[Tuple[Target, TargetRecord], None, None]:
+        """Fetch failed targets present in tracked jobs along with their records."""
+        tracked_jobs = self.tracked_jobs
         jobs = {
-            self.tracked_jobs[target.name]: target
+            job_id: target
             for target in self.targets
-            if target.name in self.tracked_jobs
+            if (job_id := tracked_jobs.get(target.name)) is not None
         }
 
         if not jobs:
             return
 
-        p = subprocess.run(
-            args=f"""sacct \
-                --jobs {",".join(jobs.keys())} \
-                --format='{",".join(self.sacct_fields)}' \
-                --parsable2""",
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            text=True,
-        )
-        header, *records = p.stdout.strip().split("\n")
-        header = header.strip().split("|")
+        with ThreadPoolExecutor(max_workers=self.LOG_WORKERS) as executor:
+            futures = [
+                (target, executor.submit(self._build_record, target, accounting))
+                for accounting in self._sacct(job_ids=jobs.keys())
+                if (target := jobs.get(accounting["JobID"])) is not None
+            ]
+
+            for target, future in futures:
+                yield target, future.result()
 
-        for accounting in records:
-            accounting = dict(zip(header, accounting.strip().split("|")))
+    def fetch(self) -> Generator[TargetRecord, None, None]:
+        """Fetch records of failed targets present in tracked jobs."""
+        for _, record in self._fetch():
+            yield record
 
-            if (id := accounting["JobID"]) not in jobs:
-                continue
+    @cached_property
+    def _target_records(self) -> List[Tuple[Target, TargetRecord]]:
+        """Failed targets and their records, fetched once per instance."""
+        return list(self._fetch())
 
-            target = jobs[id]
-            self.failure_map[target] = (
-                failure_type := self._determine_cause_of_failure(
-                    target=target,
-                    state=accounting["State"],
-                )
-            )
+    @cached_property
+    def records(self) -> List[TargetRecord]:
+        """Records of failed targets, fetched once per instance."""
+        return [record for _, record in self._target_records]
 
-            yield TargetRecord(
-                time_of_failure=self._get_log_modification_time(target=target),
-                name=target.name,
-                # group=target.group,
-                node=accounting["NodeList"],
-                failure_type=failure_type,
-                exit_code=accounting["ExitCode"],
-                allocated_memory=_parse_memory_string(
-                    memory_string=accounting["ReqMem"],
-                    cores=accounting["NCPUS"],
-                    nodes=accounting["NNodes"],
-                ),
-                used_memory=_parse_memory_string(
-                    memory_string=accounting["MaxRSS"],
-                    cores=accounting["NCPUS"],
-                    nodes=accounting["NNodes"],
-                ),
-                allocated_walltime=accounting["Timelimit"],
-                used_walltime=accounting["Elapsed"],
-            )
+    @cached_property
+    def failure_map(self) -> Dict[Target, FailureType]:
+        """Failure types of failed targets present in tracked jobs."""
+        return {target: record.failure_type for target, record in self._target_records}
 
     def to_file(self, path: Path) -> None:
         """Log records of failed targets to a file."""
-        if not path.exists():
-            path.write_text("\t".join(TargetRecord.format_header()) + "\n")
-        for record in self.fetch():
-            with path.open(mode="a") as f:
-                f.write("\t".join(record.format_record()) + "\n")
+        write_header = not path.exists()
+        with path.open(mode="a") as f:
+            if write_header:
+                f.write("\t".join(TargetRecord.format_header()) + "\n")
+            f.writelines(
+                "\t".join(record.format_record()) + "\n" for record in self.records
+            )
 
     def to_stdout(self) -> None:
         """Print records of failed targets as a table.
-        Based on the gwf-utilization implementation."""
+        Based on the gwf-utilization implementation. Records exceeding
+        MAX_TABLE_ROWS are printed as tab-separated lines instead."""
         rows = [TargetRecord.format_header()] + [
-            record.format_record() for record in self.fetch()
+            record.format_record() for record in self.records
         ]
 
         if len(rows) <= 1:
             # Don't print an empty table.
             return
 
+        if len(self.records) > self.MAX_TABLE_ROWS:
+            sys.stdout.writelines("\t".join(row) + "\n" for row in rows)
+            return
+
         table = Texttable()
 
         table.set_deco(Texttable.BORDER | Texttable.HEADER | Texttable.VLINES)
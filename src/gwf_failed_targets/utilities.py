@@ -1,6 +1,11 @@
+import os
+from collections import deque
 from enum import IntEnum, auto
-from io import TextIOWrapper
-from typing import List
+from typing import BinaryIO, List
+
+
+TAIL_SEEK_THRESHOLD = 64 * 1024
+TAIL_BLOCK_SIZE = 8 * 1024
 
 
 class FailureType(IntEnum):
@@ -11,18 +16,21 @@ class FailureType(IntEnum):
     FileSystem = auto()
 
 
-def tail(f: TextIOWrapper, n: int = 10) -> List[str]:
-    """Get the last n lines of a file.
-    Source: https://stackoverflow.com/a/280083"""
+def tail(f: BinaryIO, n: int = 10) -> List[bytes]:
+    """Get the last n lines of a file opened in binary mode.
+    Small files are read in a single pass, while large files are read from
+    increasingly large blocks at the end of the file until n lines are found.
+    Seeking to arbitrary byte offsets requires a binary handle."""
     assert n >= 0
-    pos, lines = n + 1, []
-    while len(lines) <= n:
-        try:
-            f.seek(-pos, 2)
-        except IOError:
-            f.seek(0)
-            break
-        finally:
-            lines = list(f)
-        pos *= 2
-    return lines[-n:]
+    size = os.fstat(f.fileno()).st_size
+    offset = size - TAIL_BLOCK_SIZE
+    while size > TAIL_SEEK_THRESHOLD and offset > 0:
+        f.seek(offset)
+        # Skip the (possibly partial) line at the start of the block.
+        f.readline()
+        lines = deque(f, maxlen=n)
+        if len(lines) >= n:
+            return list(lines)
+        offset -= size - offset
+    f.seek(0)
+    return list(deque(f, maxlen=n))